@@ -10,6 +10,7 @@ import numpy as np
 import json
 import time
 from datetime import datetime
+from state_backend.state_store import get_state_store
 
 class AnalyticsSection:
     """
@@ -22,9 +23,8 @@ class AnalyticsSection:
         """
         Initialize the AnalyticsSection class.
         """
-        # Initialize session state for storing sent data if it doesn't exist
-        if "sent_data_log" not in st.session_state:
-            st.session_state.sent_data_log = []
+        # Shared state backend holding the sent data log for all workers
+        self.state_store = get_state_store()
         
         # Initialize session state for tracking when data was last updated
         if "last_data_update" not in st.session_state:
@@ -73,12 +73,13 @@ class AnalyticsSection:
             alt.Chart: An Altair chart visualization or None if no data.
         """
         # If no data has been sent yet, return None
-        if not st.session_state.sent_data_log:
+        sent_data_log = self.state_store.get_log(limit=50)  # Use last 50 entries
+        if not sent_data_log:
             return None
         
         # Extract all ages from the logs
         all_ages = []
-        for entry in st.session_state.sent_data_log[-50:]:  # Use last 50 entries
+        for entry in sent_data_log:
             try:
                 payload = json.loads(entry.get("payload", "{}"))
                 # Extract ages from the people array
@@ -117,12 +118,13 @@ class AnalyticsSection:
             alt.Chart: An Altair chart visualization or None if no data.
         """
         # If no data has been sent yet, return None
-        if not st.session_state.sent_data_log:
+        sent_data_log = self.state_store.get_log(limit=50)  # Use last 50 entries
+        if not sent_data_log:
             return None
         
         # Extract person count data from logs
         device_data = []
-        for entry in st.session_state.sent_data_log[-50:]:  # Use last 50 entries
+        for entry in sent_data_log:
             try:
                 payload = json.loads(entry.get("payload", "{}"))
                 device_data.append({
@@ -162,7 +164,8 @@ class AnalyticsSection:
         """
         Display a table of the most recent data sent to the API.
         """
-        if not st.session_state.sent_data_log:
+        sent_data_log = self.state_store.get_log(limit=10)
+        if not sent_data_log:
             st.info("No data has been sent to the API yet.")
             return
         
@@ -171,7 +174,7 @@ class AnalyticsSection:
         
         # Create a formatted table of the last 10 entries
         log_data = []
-        for entry in st.session_state.sent_data_log[-10:]:
+        for entry in sent_data_log:
             try:
                 payload = json.loads(entry.get("payload", "{}"))
                 # Extract age data from people array
@@ -202,7 +205,7 @@ class AnalyticsSection:
         
         # Add a button to clear the log
         if st.button("Clear Data Log"):
-            st.session_state.sent_data_log = []
+            self.state_store.clear_log()
             st.rerun()
     
     def add_sent_data_to_log(self, payload_str, status_code):
@@ -220,12 +223,8 @@ class AnalyticsSection:
             "status_code": status_code
         }
         
-        # Add to the list
-        st.session_state.sent_data_log.append(entry)
-        
-        # Keep only the last 100 entries to avoid using too much memory
-        if len(st.session_state.sent_data_log) > 100:
-            st.session_state.sent_data_log = st.session_state.sent_data_log[-100:]
+        # Add to the shared log, which keeps only the last 100 entries
+        self.state_store.append_log(entry)
         
         # Update the last update time
         st.session_state.last_data_update = time.time()
@@ -8,7 +8,7 @@ import requests
 import json
 import random
 from datetime import datetime
-import time
+from state_backend.state_store import get_state_store, get_worker_id
 
 
 class InputSection:
@@ -28,38 +28,17 @@ class InputSection:
         # API endpoint for data ingestion
         self.api_endpoint = "https://camera-data-ingestor.nicedesert-291b7b89.eastus.azurecontainerapps.io/ingest"
         
-        # Initialize session state for tracking data collection status and API responses
-        if "data_collection_active" not in st.session_state:
-            st.session_state.data_collection_active = {}
-            # Initialize status for each company and data point
-            for company in self.companies:
-                for i in range(3):
-                    key = f"{company}_data_{i+1}"
-                    st.session_state.data_collection_active[key] = False
-                    
-        # Initialize last sent time dict
-        if "last_sent_time" not in st.session_state:
-            st.session_state.last_sent_time = {}
-            for company in self.companies:
-                for i in range(3):
-                    key = f"{company}_data_{i+1}"
-                    st.session_state.last_sent_time[key] = 0
-                    
-        # Initialize API response tracking dict
-        if "api_responses" not in st.session_state:
-            st.session_state.api_responses = {}
-            for company in self.companies:
-                for i in range(3):
-                    key = f"{company}_data_{i+1}"
-                    st.session_state.api_responses[key] = {"status": None, "message": "Not started"}
-                    
-        # Initialize data send counter dict
-        if "data_send_counter" not in st.session_state:
-            st.session_state.data_send_counter = {}
-            for company in self.companies:
-                for i in range(3):
-                    key = f"{company}_data_{i+1}"
-                    st.session_state.data_send_counter[key] = 0
+        # Shared state backend holding device status, counters and send times for all workers
+        self.state_store = get_state_store()
+
+        # Identifier used to hold device leases, so only one worker process sends per device
+        self.worker_id = get_worker_id()
+
+        # Seconds between two sends of an active device
+        self.send_interval = 15
+
+        # A lease outlives a few send intervals so a stopped worker's devices are taken over
+        self.lease_ttl = self.send_interval * 3
 
     def display(self):
         """
@@ -90,46 +69,33 @@ class InputSection:
                         st.markdown("🎥")
 
                         # Toggle button state based on current status
-                        is_active = st.session_state.data_collection_active[button_key]
+                        is_active = self.state_store.get_active(button_key)
                         
-                        # If active, check if it's time to send new data
-                        if is_active:
-                            current_time = time.time()
-                            last_sent = st.session_state.last_sent_time[button_key]
-                            
-                            # Send data every 15 seconds if button is active
-                            if current_time - last_sent > 15:
-                                try:
-                                    status_code = self._send_random_data_to_api(company, i+1)
-                                    st.session_state.last_sent_time[button_key] = current_time
+                        # If active, send new data every 15 seconds when this worker owns the device lease
+                        if is_active and self.state_store.claim_send(
+                                button_key, self.worker_id, self.send_interval, self.lease_ttl):
+                            try:
+                                status_code = self._send_random_data_to_api(company, i+1)
+                                
+                                # Increment the counter
+                                send_count = self.state_store.increment_counter(button_key)
+                                
+                                # Update API response status
+                                if status_code == 200:
+                                    self.state_store.set_status(
+                                        button_key,
+                                        "success",
+                                        f"Data sent at {datetime.now().strftime('%H:%M:%S')} (sent {send_count} times)"
+                                    )
                                     
-                                    # Increment the counter
-                                    if button_key in st.session_state.data_send_counter:
-                                        st.session_state.data_send_counter[button_key] += 1
-                                    else:
-                                        st.session_state.data_send_counter[button_key] = 1
-                                    
-                                    # Update API response status
-                                    if status_code == 200:
-                                        st.session_state.api_responses[button_key] = {
-                                            "status": "success",
-                                            "message": f"Data sent at {datetime.now().strftime('%H:%M:%S')} (sent {st.session_state.data_send_counter[button_key]} times)"
-                                        }
-                                        
-                                        # Flag for UI update without force rerun
-                                        if "needs_update" not in st.session_state:
-                                            st.session_state.needs_update = True
-                                    else:
-                                        st.session_state.api_responses[button_key] = {
-                                            "status": "error",
-                                            "message": f"API Error: {status_code}"
-                                        }
-                                    
-                                except Exception as e:
-                                    st.session_state.api_responses[button_key] = {
-                                        "status": "error",
-                                        "message": f"Error: {str(e)[:50]}"
-                                    }
+                                    # Flag for UI update without force rerun
+                                    if "needs_update" not in st.session_state:
+                                        st.session_state.needs_update = True
+                                else:
+                                    self.state_store.set_status(button_key, "error", f"API Error: {status_code}")
+                                
+                            except Exception as e:
+                                self.state_store.set_status(button_key, "error", f"Error: {str(e)[:50]}")
 
                         # Display Start/Stop button with appropriate color
                         if is_active:
@@ -144,56 +110,53 @@ class InputSection:
                                      type=button_type):
                             # Toggle the status when clicked
                             new_status = not is_active
-                            st.session_state.data_collection_active[button_key] = new_status
+                            self.state_store.set_active(button_key, new_status)
 
-                            if new_status:
+                            if new_status and not self.state_store.claim_send(
+                                    button_key, self.worker_id, 0, self.lease_ttl):
+                                # Another worker process owns this device and keeps sending its data
+                                st.toast(f"Started data collection for {company}, device {i+1}", icon="✅")
+                                self.state_store.set_status(button_key, "pending", "Waiting for the owning worker to send")
+                            elif new_status:
                                 # If starting, send data immediately
                                 try:
                                     status_code = self._send_random_data_to_api(company, i+1)
-                                    st.session_state.last_sent_time[button_key] = time.time()
                                     
                                     # Increment the counter on first send
-                                    if button_key in st.session_state.data_send_counter:
-                                        st.session_state.data_send_counter[button_key] += 1
-                                    else:
-                                        st.session_state.data_send_counter[button_key] = 1
+                                    send_count = self.state_store.increment_counter(button_key)
                                         
                                     if status_code == 200:
                                         st.toast(f"Started data collection for {company}, device {i+1}", icon="✅")
-                                        st.session_state.api_responses[button_key] = {
-                                            "status": "success",
-                                            "message": f"Data sent at {datetime.now().strftime('%H:%M:%S')} (sent {st.session_state.data_send_counter[button_key]} times)"
-                                        }
+                                        self.state_store.set_status(
+                                            button_key,
+                                            "success",
+                                            f"Data sent at {datetime.now().strftime('%H:%M:%S')} (sent {send_count} times)"
+                                        )
                                         
                                         # Mark that the UI needs to update - let the Streamlit refresh cycle handle it
                                         if "needs_update" not in st.session_state:
                                             st.session_state.needs_update = True
                                     else:
                                         st.toast(f"Error sending data: API returned {status_code}", icon="⚠️")
-                                        st.session_state.api_responses[button_key] = {
-                                            "status": "error",
-                                            "message": f"API Error: {status_code}"
-                                        }
+                                        self.state_store.set_status(button_key, "error", f"API Error: {status_code}")
                                         
                                 except Exception as e:
                                     st.toast(f"Error sending data: {str(e)[:50]}", icon="❌")
-                                    st.session_state.api_responses[button_key] = {
-                                        "status": "error",
-                                        "message": f"Error: {str(e)[:50]}"
-                                    }
+                                    self.state_store.set_status(button_key, "error", f"Error: {str(e)[:50]}")
                             else:
                                 st.toast(f"Stopped data collection for {company}, device {i+1}")
-                                st.session_state.api_responses[button_key] = {
-                                    "status": "stopped", 
-                                    "message": "Data collection stopped"
-                                }
+                                self.state_store.set_status(button_key, "stopped", "Data collection stopped")
+                                
+                                # Free the device whichever worker owns it, so the next start is not blocked
+                                self.state_store.drop_lease(button_key)
 
                             # Force a rerun to update UI
                             st.rerun()
                         
                         # Display current status indicator
-                        status = st.session_state.api_responses[button_key]["status"]
-                        message = st.session_state.api_responses[button_key]["message"]
+                        api_response = self.state_store.get_status(button_key)
+                        status = api_response["status"]
+                        message = api_response["message"]
                         
                         if status == "success":
                             st.success(message)
@@ -201,6 +164,8 @@ class InputSection:
                             st.error(message)
                         elif status == "stopped":
                             st.info(message)
+                        elif status == "pending":
+                            st.warning(message)
                         else:
                             st.info("Ready")
     
@@ -0,0 +1,530 @@
+"""
+State Store Module.
+This module contains the shared state backends used by every app worker process.
+
+Device status, send counters, send timestamps and the analytics data log live
+here instead of in per-session memory, so that several Streamlit workers on the
+same host see the same state. Each simulated device is also protected by a
+lease so that at most one worker process sends its traffic at a time.
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import closing
+from functools import lru_cache
+
+
+# Number of analytics log entries kept in the shared store
+MAX_LOG_ENTRIES = 100
+
+
+def get_worker_id():
+    """
+    Build an identifier for the current worker process.
+
+    Returns:
+        str: Host name and process id, unique per worker on a host or container.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class StateStore(ABC):
+    """
+    Base class describing the shared state operations used by the app sections.
+
+    Subclasses persist the data in a backend that all worker processes can reach.
+    """
+
+    @abstractmethod
+    def get_active(self, key):
+        """
+        Return whether data collection is active for a device.
+
+        Args:
+            key (str): Device key, e.g. "Company A_data_1".
+
+        Returns:
+            bool: True if the device is currently collecting data.
+        """
+
+    @abstractmethod
+    def set_active(self, key, active):
+        """
+        Set whether data collection is active for a device.
+
+        Args:
+            key (str): Device key.
+            active (bool): New collection status.
+        """
+
+    @abstractmethod
+    def get_status(self, key):
+        """
+        Return the last API response status for a device.
+
+        Args:
+            key (str): Device key.
+
+        Returns:
+            dict: Dictionary with "status" and "message" entries.
+        """
+
+    @abstractmethod
+    def set_status(self, key, status, message):
+        """
+        Store the last API response status for a device.
+
+        Args:
+            key (str): Device key.
+            status (str): One of "success", "error", "stopped" or "pending".
+            message (str): Message displayed under the device button.
+        """
+
+    @abstractmethod
+    def increment_counter(self, key):
+        """
+        Increment the send counter for a device.
+
+        Args:
+            key (str): Device key.
+
+        Returns:
+            int: The counter value after incrementing.
+        """
+
+    @abstractmethod
+    def claim_send(self, key, owner, interval, lease_ttl):
+        """
+        Acquire or renew the device lease and claim the next send slot.
+
+        The caller may send data only when this returns True: the device is
+        active, the owner holds the lease for it and at least `interval`
+        seconds have passed since the last send by any worker. All three are
+        checked in one atomic step, so a device stopped by another session
+        can no longer be claimed.
+
+        Args:
+            key (str): Device key.
+            owner (str): Worker identifier, see get_worker_id().
+            interval (float): Minimum number of seconds between two sends.
+            lease_ttl (float): Lease duration in seconds.
+
+        Returns:
+            bool: True if the caller owns this send.
+        """
+
+    @abstractmethod
+    def drop_lease(self, key):
+        """
+        Remove the device lease whichever worker holds it.
+
+        Used when a device is stopped: an inactive device has nothing to
+        protect, and a leftover lease would block the next start.
+
+        Args:
+            key (str): Device key.
+        """
+
+    @abstractmethod
+    def append_log(self, entry):
+        """
+        Append an entry to the analytics data log.
+
+        Args:
+            entry (dict): Dictionary with "timestamp", "payload" and "status_code".
+        """
+
+    @abstractmethod
+    def get_log(self, limit=MAX_LOG_ENTRIES):
+        """
+        Return the most recent analytics log entries, oldest first.
+
+        Args:
+            limit (int): Maximum number of entries to return, nothing if 0 or less.
+
+        Returns:
+            list: List of entry dictionaries.
+        """
+
+    @abstractmethod
+    def clear_log(self):
+        """
+        Remove every entry from the analytics data log.
+        """
+
+
+class SQLiteStateStore(StateStore):
+    """
+    State store backed by a SQLite database file in WAL mode.
+
+    All worker processes on a host open the same file. WAL mode lets readers
+    proceed while a writer commits, and lease/slot claims run inside
+    BEGIN IMMEDIATE transactions so only one process can win them.
+    Public methods behave as documented on StateStore.
+    """
+
+    def __init__(self, db_path):
+        """
+        Initialize the SQLiteStateStore class.
+
+        Args:
+            db_path (str): Path of the SQLite database file.
+        """
+        self.db_path = db_path
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS device_state (
+                    key TEXT PRIMARY KEY,
+                    active INTEGER NOT NULL DEFAULT 0,
+                    status TEXT,
+                    message TEXT NOT NULL DEFAULT 'Not started',
+                    counter INTEGER NOT NULL DEFAULT 0,
+                    last_sent REAL NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS device_lease (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS sent_data_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status_code INTEGER
+                );
+                """
+            )
+
+    def _connect(self):
+        """
+        Open a new connection to the database.
+
+        Streamlit runs each script rerun on a fresh thread, so connections are
+        opened per operation and closed right after instead of being cached.
+
+        Returns:
+            sqlite3.Connection: Connection in autocommit mode.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _execute(self, sql, params=()):
+        """
+        Run a single statement on a short-lived connection.
+
+        Args:
+            sql (str): SQL statement.
+            params (tuple): Statement parameters.
+
+        Returns:
+            list: Rows returned by the statement.
+        """
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _transaction(self, conn, work):
+        """
+        Run `work(conn)` inside a BEGIN IMMEDIATE transaction.
+
+        Args:
+            conn (sqlite3.Connection): Open connection.
+            work (callable): Function receiving the connection.
+
+        Returns:
+            The value returned by `work`.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    @staticmethod
+    def _upsert(conn, key, column, value):
+        """
+        Set a single column of a device row, creating the row if needed.
+
+        Args:
+            conn (sqlite3.Connection): Open connection.
+            key (str): Device key.
+            column (str): Column name, only ever a literal from this class.
+            value: New column value.
+        """
+        conn.execute(
+            f"INSERT INTO device_state (key, {column}) VALUES (?, ?) "
+            f"ON CONFLICT(key) DO UPDATE SET {column} = excluded.{column}",
+            (key, value)
+        )
+
+    def get_active(self, key):
+        rows = self._execute("SELECT active FROM device_state WHERE key = ?", (key,))
+        return bool(rows and rows[0][0])
+
+    def set_active(self, key, active):
+        with closing(self._connect()) as conn:
+            self._upsert(conn, key, "active", int(bool(active)))
+
+    def get_status(self, key):
+        rows = self._execute("SELECT status, message FROM device_state WHERE key = ?", (key,))
+        if not rows:
+            return {"status": None, "message": "Not started"}
+        return {"status": rows[0][0], "message": rows[0][1]}
+
+    def set_status(self, key, status, message):
+        self._execute(
+            "INSERT INTO device_state (key, status, message) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET status = excluded.status, message = excluded.message",
+            (key, status, message)
+        )
+
+    def increment_counter(self, key):
+        def work(conn):
+            conn.execute(
+                "INSERT INTO device_state (key, counter) VALUES (?, 1) "
+                "ON CONFLICT(key) DO UPDATE SET counter = counter + 1",
+                (key,)
+            )
+            return conn.execute(
+                "SELECT counter FROM device_state WHERE key = ?", (key,)
+            ).fetchone()[0]
+
+        with closing(self._connect()) as conn:
+            return self._transaction(conn, work)
+
+    def claim_send(self, key, owner, interval, lease_ttl):
+        def work(conn):
+            # Read the clock once the write lock is held, the wait can take seconds
+            now = time.time()
+
+            # Re-check under the lock: the device may have been stopped or leased meanwhile
+            if not self._may_claim(conn, key, owner, now):
+                return False
+
+            # Take the lease if it is free or expired, renew it if we already hold it
+            conn.execute(
+                "INSERT INTO device_lease (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at",
+                (key, owner, now + lease_ttl)
+            )
+
+            # Claim the send slot shared by every session of every worker
+            row = conn.execute(
+                "SELECT last_sent FROM device_state WHERE key = ?", (key,)
+            ).fetchone()
+            if now - row[0] < interval:
+                return False
+            self._upsert(conn, key, "last_sent", now)
+            return True
+
+        with closing(self._connect()) as conn:
+            # Most calls come from workers that do not own the device, so answer
+            # those with a plain read instead of queueing on the write lock
+            if not self._may_claim(conn, key, owner, time.time()):
+                return False
+            return self._transaction(conn, work)
+
+    @staticmethod
+    def _may_claim(conn, key, owner, now):
+        """
+        Check that a device is active and its lease is free, expired or held by the owner.
+
+        Args:
+            conn (sqlite3.Connection): Open connection.
+            key (str): Device key.
+            owner (str): Worker identifier.
+            now (float): Current time in seconds since the epoch.
+
+        Returns:
+            bool: True if the owner may take or renew the lease.
+        """
+        row = conn.execute(
+            "SELECT s.active, l.owner, l.expires_at FROM device_state s "
+            "LEFT JOIN device_lease l ON l.key = s.key WHERE s.key = ?",
+            (key,)
+        ).fetchone()
+        if row is None or not row[0]:
+            return False
+        lease_owner, expires_at = row[1], row[2]
+        return lease_owner is None or lease_owner == owner or expires_at <= now
+
+    def drop_lease(self, key):
+        self._execute("DELETE FROM device_lease WHERE key = ?", (key,))
+
+    def append_log(self, entry):
+        def work(conn):
+            conn.execute(
+                "INSERT INTO sent_data_log (timestamp, payload, status_code) VALUES (?, ?, ?)",
+                (entry["timestamp"], entry["payload"], entry["status_code"])
+            )
+            # Keep only the last entries to avoid the log growing without bound
+            conn.execute(
+                "DELETE FROM sent_data_log WHERE id <= "
+                "(SELECT MAX(id) FROM sent_data_log) - ?",
+                (MAX_LOG_ENTRIES,)
+            )
+
+        with closing(self._connect()) as conn:
+            self._transaction(conn, work)
+
+    def get_log(self, limit=MAX_LOG_ENTRIES):
+        # A negative LIMIT means no limit in SQLite
+        if limit <= 0:
+            return []
+        rows = self._execute(
+            "SELECT timestamp, payload, status_code FROM sent_data_log "
+            "ORDER BY id DESC LIMIT ?",
+            (limit,)
+        )
+        return [
+            {"timestamp": row[0], "payload": row[1], "status_code": row[2]}
+            for row in reversed(rows)
+        ]
+
+    def clear_log(self):
+        self._execute("DELETE FROM sent_data_log")
+
+
+class RedisStateStore(StateStore):
+    """
+    State store backed by a Redis-compatible server.
+
+    Any client exposing the redis-py API can be passed in, so a local stand-in
+    (for example fakeredis, or a Redis-protocol server such as Valkey or
+    KeyDB) can replace a real Redis instance. Public methods behave as
+    documented on StateStore.
+    """
+
+    # Check the device is active, take or renew the lease, then claim the send slot if it is due
+    _CLAIM_SEND_SCRIPT = """
+    if redis.call('HGET', KEYS[3], ARGV[3]) ~= '1' then
+        return 0
+    end
+    local holder = redis.call('GET', KEYS[1])
+    if holder and holder ~= ARGV[1] then
+        return 0
+    end
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    local last_sent = tonumber(redis.call('HGET', KEYS[2], ARGV[3]) or '0')
+    if tonumber(ARGV[4]) - last_sent >= tonumber(ARGV[5]) then
+        redis.call('HSET', KEYS[2], ARGV[3], ARGV[4])
+        return 1
+    end
+    return 0
+    """
+
+    def __init__(self, client, prefix="camera-app"):
+        """
+        Initialize the RedisStateStore class.
+
+        Args:
+            client: A redis-py compatible client created with decode_responses=True.
+            prefix (str): Prefix applied to every key written by the store.
+        """
+        self.client = client
+        self.prefix = prefix
+        self._claim_send = client.register_script(self._CLAIM_SEND_SCRIPT)
+
+    def _key(self, name):
+        """
+        Build a namespaced key.
+
+        Args:
+            name (str): Key name inside the store namespace.
+
+        Returns:
+            str: The prefixed key.
+        """
+        return f"{self.prefix}:{name}"
+
+    def get_active(self, key):
+        return self.client.hget(self._key("active"), key) == "1"
+
+    def set_active(self, key, active):
+        self.client.hset(self._key("active"), key, "1" if active else "0")
+
+    def get_status(self, key):
+        value = self.client.hget(self._key("status"), key)
+        if value is None:
+            return {"status": None, "message": "Not started"}
+        return json.loads(value)
+
+    def set_status(self, key, status, message):
+        self.client.hset(
+            self._key("status"), key, json.dumps({"status": status, "message": message})
+        )
+
+    def increment_counter(self, key):
+        return int(self.client.hincrby(self._key("counter"), key, 1))
+
+    def claim_send(self, key, owner, interval, lease_ttl):
+        claimed = self._claim_send(
+            keys=[self._key(f"lease:{key}"), self._key("last_sent"), self._key("active")],
+            args=[owner, int(lease_ttl * 1000), key, time.time(), interval]
+        )
+        return bool(claimed)
+
+    def drop_lease(self, key):
+        self.client.delete(self._key(f"lease:{key}"))
+
+    def append_log(self, entry):
+        pipe = self.client.pipeline()
+        pipe.rpush(self._key("sent_data_log"), json.dumps(entry))
+        pipe.ltrim(self._key("sent_data_log"), -MAX_LOG_ENTRIES, -1)
+        pipe.execute()
+
+    def get_log(self, limit=MAX_LOG_ENTRIES):
+        # LRANGE from -0 would return the whole list
+        if limit <= 0:
+            return []
+        values = self.client.lrange(self._key("sent_data_log"), -limit, -1)
+        return [json.loads(value) for value in values]
+
+    def clear_log(self):
+        self.client.delete(self._key("sent_data_log"))
+
+
+@lru_cache(maxsize=None)
+def get_state_store():
+    """
+    Return the state store shared by all sessions of this worker process.
+
+    The backend is selected with the STATE_BACKEND environment variable:
+    "sqlite" (default) uses the file at STATE_DB_PATH, "redis" connects to
+    REDIS_URL.
+
+    Returns:
+        StateStore: The configured state store.
+    """
+    backend = os.environ.get("STATE_BACKEND", "sqlite").lower()
+
+    if backend == "sqlite":
+        return SQLiteStateStore(os.environ.get("STATE_DB_PATH", "data/state.db"))
+
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "STATE_BACKEND=redis requires the 'redis' package to be installed"
+            ) from e
+        client = redis.Redis.from_url(
+            os.environ.get("REDIS_URL", "redis://localhost:6379/0"),
+            decode_responses=True
+        )
+        return RedisStateStore(client)
+
+    raise ValueError(f"Unknown STATE_BACKEND: {backend}")
@@ -0,0 +1,144 @@
+"""
+Tests for the shared state backends and their lease-based send ownership.
+"""
+
+import time
+import threading
+
+import pytest
+
+from state_backend.state_store import MAX_LOG_ENTRIES, SQLiteStateStore, RedisStateStore
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def store(request, tmp_path):
+    """
+    Provide a fresh state store for each backend.
+    """
+    if request.param == "sqlite":
+        return SQLiteStateStore(str(tmp_path / "state.db"))
+
+    fakeredis = pytest.importorskip("fakeredis")
+    # Lua support in fakeredis is needed for the claim script
+    pytest.importorskip("lupa")
+    return RedisStateStore(fakeredis.FakeRedis(decode_responses=True))
+
+
+@pytest.fixture
+def active_store(store):
+    """
+    Provide a state store with the "cam" device started.
+    """
+    store.set_active("cam", True)
+    return store
+
+
+def _log_entry(i):
+    return {"timestamp": str(i), "payload": "{}", "status_code": 200}
+
+
+def test_claim_send_respects_interval(active_store):
+    assert active_store.claim_send("cam", "worker-a", 15, 45)
+    assert not active_store.claim_send("cam", "worker-a", 15, 45)
+    assert active_store.claim_send("cam", "worker-a", 0, 45)
+
+
+def test_claim_send_rejects_other_owner(active_store):
+    assert active_store.claim_send("cam", "worker-a", 0, 45)
+    assert not active_store.claim_send("cam", "worker-b", 0, 45)
+    assert active_store.claim_send("cam", "worker-a", 0, 45)
+
+
+def test_claim_send_under_contention(active_store):
+    wins = {}
+
+    def worker(owner):
+        barrier.wait()
+        wins[owner] = sum(active_store.claim_send("cam", owner, 60, 45) for _ in range(20))
+
+    owners = [f"worker-{i}" for i in range(6)]
+    barrier = threading.Barrier(len(owners))
+    threads = [threading.Thread(target=worker, args=(owner,)) for owner in owners]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(wins.values()) == 1
+
+
+def test_expired_lease_is_taken_over(active_store):
+    assert active_store.claim_send("cam", "worker-a", 0, 0.2)
+    assert not active_store.claim_send("cam", "worker-b", 0, 0.2)
+    time.sleep(0.3)
+    assert active_store.claim_send("cam", "worker-b", 0, 45)
+    assert not active_store.claim_send("cam", "worker-a", 0, 45)
+
+
+def test_drop_lease_frees_device_for_any_worker(active_store):
+    assert active_store.claim_send("cam", "worker-a", 0, 45)
+    active_store.drop_lease("cam")
+    assert active_store.claim_send("cam", "worker-b", 0, 45)
+
+
+def test_stopped_device_cannot_be_claimed(store):
+    assert not store.claim_send("cam", "worker-a", 0, 45)
+
+    store.set_active("cam", True)
+    assert store.claim_send("cam", "worker-a", 0, 45)
+
+    # A session that read active=1 before the stop must not win the claim afterwards
+    store.set_active("cam", False)
+    store.drop_lease("cam")
+    assert not store.claim_send("cam", "worker-a", 0, 45)
+
+    # No lease was taken back, so another worker can restart the device at once
+    store.set_active("cam", True)
+    assert store.claim_send("cam", "worker-b", 0, 45)
+
+
+def test_status_defaults_and_updates(store):
+    assert store.get_status("cam") == {"status": None, "message": "Not started"}
+    store.set_status("cam", "pending", "Waiting for the owning worker to send")
+    assert store.get_status("cam") == {"status": "pending", "message": "Waiting for the owning worker to send"}
+
+
+def test_active_defaults_and_updates(store):
+    assert not store.get_active("cam")
+    store.set_active("cam", True)
+    assert store.get_active("cam")
+    store.set_active("cam", False)
+    assert not store.get_active("cam")
+
+
+def test_increment_counter_returns_new_value(store):
+    assert [store.increment_counter("cam") for _ in range(3)] == [1, 2, 3]
+    assert store.increment_counter("other") == 1
+
+
+def test_log_is_trimmed_and_ordered_oldest_first(store):
+    for i in range(MAX_LOG_ENTRIES + 50):
+        store.append_log(_log_entry(i))
+
+    log = store.get_log()
+    assert [entry["timestamp"] for entry in log] == [str(i) for i in range(50, MAX_LOG_ENTRIES + 50)]
+    assert log[-1] == _log_entry(MAX_LOG_ENTRIES + 49)
+
+
+def test_get_log_limit(store):
+    for i in range(5):
+        store.append_log(_log_entry(i))
+
+    assert [entry["timestamp"] for entry in store.get_log(limit=2)] == ["3", "4"]
+    assert len(store.get_log(limit=10)) == 5
+    assert store.get_log(limit=0) == []
+    assert store.get_log(limit=-1) == []
+
+
+def test_clear_log(store):
+    store.append_log(_log_entry(0))
+    store.clear_log()
+    assert store.get_log() == []
+
+    store.append_log(_log_entry(1))
+    assert store.get_log() == [_log_entry(1)]